@@ -1,19 +1,226 @@
 from shiny import App, ui, render, reactive, Inputs, Outputs
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
+import matplotlib
+matplotlib.use('Agg')  # plots are only ever rendered to PNG for shiny
+matplotlib.rcParams.update({
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+})
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Patch
 import os
 import numpy as np
 import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numexpr as ne
+except ImportError:  # numexpr is optional; fall back to numpy for the pixel transform
+    ne = None
 
 # constants for DK2 headset
 DK2_RESOLUTION = (960, 1080)  # Per eye resolution in pixels
 FOV_X = 90  # Horizontal field of view in degrees
 FOV_Y = 100  # Vertical field of view in degrees
+FIGURE_DPI = 100  # Resolution the plots are rendered at
+FIXATION_MARKER_SIZE = np.sqrt(5)  # Fixation marker diameter in points (area of 5 points^2)
+FIXATION_MARKER_EDGE = 1.0  # Fixation marker edge width in points (matplotlib's default patch.linewidth)
+DENSITY_BIN_PX = 4  # Bin size in pixels for the aggregate fixation density image
+
+# right_x, right_y, left_x, left_y columns in the raw participant files
+EYE_COLUMNS = [7, 8, 9, 10]
+READ_CHUNK_ROWS = 100_000  # Rows parsed per chunk when reading a participant file
 
 # directory with participant data
 default_directory = '/Users/f007kmv/Dartmouth College Dropbox/Benjamin Chamberlain Zivsak/Projects/SNAPI_BenVrGazeCore/SNAPI-Analysis/SNAPI-Analysis/rawDataNew_modified'
 
+# squared distances of an (N, 2) xy array from the screen center, sorted. the
+# inside count is monotonic in the radius, so any radius can then be answered
+# with a binary search instead of a pass over every point
+def sorted_squared_distances(xy):
+    center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
+    dx = xy[:, 0] - center_x
+    dy = xy[:, 1] - center_y
+    d2 = (dx * dx + dy * dy).astype(np.float32, copy=False)
+    d2.sort()
+    return d2
+
+# count fixations within sqrt(r2) of the screen center from their sorted squared distances
+def count_inside(d2_sorted, r2):
+    return int(np.searchsorted(d2_sorted, r2, side='right'))
+
+# average the two eyes, falling back to whichever eye is present when the
+# other is missing (same result as DataFrame.mean(axis=1))
+def _eye_mean(right, left):
+    mean = (right + left) * np.float32(0.5)
+    missing = np.isnan(mean)
+    if missing.any():
+        mean[missing] = np.where(np.isnan(right[missing]), left[missing], right[missing])
+    return mean
+
+# numexpr version of _eye_mean(right, left) * scale, evaluated in a single pass
+# (x != x is true only for NaN)
+EYE_PIXEL_EXPR = 'where(right != right, left, where(left != left, right, (right + left) * half)) * scale'
+
+# average eye position in normalized coordinates (0-1 range), scaled to pixel coordinates
+def _eye_pixel(right, left, resolution):
+    if ne is None:
+        return _eye_mean(right, left) * np.float32(resolution)
+    return ne.evaluate(EYE_PIXEL_EXPR, local_dict={
+        'right': right, 'left': left, 'half': np.float32(0.5), 'scale': np.float32(resolution)
+    })
+
+# convert a block of (right_x, right_y, left_x, left_y) rows into an (N, 2)
+# float32 array of (pixel_x, pixel_y)
+def _eye_pixels(data):
+    right_x, right_y, left_x, left_y = data.T
+    pixel_x = _eye_pixel(right_x, left_x, DK2_RESOLUTION[0])
+    pixel_y = _eye_pixel(right_y, left_y, DK2_RESOLUTION[1])
+    return np.stack([pixel_x, pixel_y], axis=1)
+
+# parse a participant file into an (N, 2) float32 array of (pixel_x, pixel_y)
+def _parse_participant_file(filepath):
+    # columns: trial, date, core_time, exp_time, pitch, yaw, roll,
+    #          right_x, right_y, left_x, left_y, right_conf, left_conf
+    # only the eye positions are used, so skip parsing everything else. read in
+    # chunks so only one chunk of raw rows is held in memory at a time
+    with pd.read_csv(filepath, delimiter=',', header=None, usecols=EYE_COLUMNS,
+                     dtype=np.float32, engine='c', chunksize=READ_CHUNK_ROWS) as reader:
+        chunks = [_eye_pixels(chunk.to_numpy()) for chunk in reader]
+
+    if not chunks:
+        return np.empty((0, 2), dtype=np.float32)
+    return np.concatenate(chunks)
+
+# sorted .txt participant files in a directory. the listing is cached on the
+# directory's mtime, which changes whenever files are added, removed or renamed
+@functools.lru_cache(maxsize=1)
+def _list_participant_files(directory, dir_mtime):
+    return tuple(sorted(f for f in os.listdir(directory) if f.endswith('.txt')))
+
+def list_participant_files(directory):
+    return _list_participant_files(directory, os.path.getmtime(directory))
+
+# preprocessed .npy copies of the participant files live in a subdirectory of
+# the data directory, along with a manifest of all participants: their fixations
+# concatenated (participants.npy), their squared distances from the screen center
+# merged and sorted (participants_d2.npy) and the file names they were built
+# from (participants_index.npz)
+CACHE_DIRNAME = '.npy_cache'
+
+def _cache_path(filepath):
+    directory, filename = os.path.split(filepath)
+    return os.path.join(directory, CACHE_DIRNAME, os.path.splitext(filename)[0] + '.npy')
+
+def _manifest_paths(directory):
+    cache_dir = os.path.join(directory, CACHE_DIRNAME)
+    return (os.path.join(cache_dir, 'participants.npy'),
+            os.path.join(cache_dir, 'participants_d2.npy'),
+            os.path.join(cache_dir, 'participants_index.npz'))
+
+def _is_fresh(path, mtime):
+    return os.path.exists(path) and os.path.getmtime(path) >= mtime
+
+# write through a uniquely named temporary file, so readers never see a partial
+# file even with several app instances writing to a shared data directory
+def _save_atomic(path, save, *args, **kwargs):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            save(f, *args, **kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# whether the manifest is up to date with the participant files
+def _manifest_is_fresh(directory, participant_files):
+    newest = max((os.path.getmtime(os.path.join(directory, f)) for f in participant_files), default=0)
+    if not all(_is_fresh(path, newest) for path in _manifest_paths(directory)):
+        return False
+    with np.load(_manifest_paths(directory)[2]) as index:
+        return list(index['names']) == list(participant_files)
+
+# memory-map the aggregate xy array if the manifest is up to date, otherwise return None
+def load_manifest(directory, participant_files):
+    if not _manifest_is_fresh(directory, participant_files):
+        return None
+    return np.load(_manifest_paths(directory)[0], mmap_mode='r')
+
+# memory-map the aggregate sorted squared distances if the manifest is up to
+# date, otherwise return None
+def load_manifest_d2(directory, participant_files):
+    if not _manifest_is_fresh(directory, participant_files):
+        return None
+    return np.load(_manifest_paths(directory)[1], mmap_mode='r')
+
+# parse a participant file for the cache, or None if it can't be parsed
+# (e.g. an empty or malformed file; pandas' parser errors are ValueErrors)
+def _try_parse_participant_file(filepath):
+    try:
+        return _parse_participant_file(filepath)
+    except ValueError:
+        return None
+
+# convert any new or modified participant files to .npy and refresh the
+# manifest. does nothing if the data directory isn't writable
+def build_cache(directory):
+    participant_files = list_participant_files(directory)
+    try:
+        os.makedirs(os.path.join(directory, CACHE_DIRNAME), exist_ok=True)
+        filepaths = [os.path.join(directory, f) for f in participant_files]
+        stale_files = [fp for fp in filepaths if not _is_fresh(_cache_path(fp), os.path.getmtime(fp))]
+        # parse in parallel; read_csv releases the GIL while parsing
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            parsed = list(executor.map(_try_parse_participant_file, stale_files))
+        for filepath, xy in zip(stale_files, parsed):
+            if xy is not None:
+                _save_atomic(_cache_path(filepath), np.save, xy)
+
+        # a file that failed to parse gets no .npy and leaves the manifest unbuilt,
+        # so loading it at render time reports the error in the plots that use it
+        if any(xy is None for xy in parsed):
+            return
+        if stale_files or not _manifest_is_fresh(directory, participant_files):
+            arrays = [np.load(_cache_path(fp), mmap_mode='r') for fp in filepaths]
+            all_xy = np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=np.float32)
+            xy_path, d2_path, index_path = _manifest_paths(directory)
+            _save_atomic(xy_path, np.save, all_xy)
+            _save_atomic(d2_path, np.save, sorted_squared_distances(all_xy))
+            # written last, so the manifest only checks out once the arrays are in place
+            _save_atomic(index_path, np.savez, names=np.array(participant_files))
+    except OSError:
+        pass
+
+# load a participant file, from its .npy cache when that is up to date.
+# cached on (filepath, mtime) so reactive recomputes (e.g. moving the
+# slider) don't reload unchanged files
+@functools.lru_cache(maxsize=256)
+def _load_and_process_data(filepath, mtime):
+    cache_path = _cache_path(filepath)
+    if _is_fresh(cache_path, mtime):
+        return np.load(cache_path, mmap_mode='r')
+
+    xy = _parse_participant_file(filepath)
+    xy.flags.writeable = False  # shared between callers through the cache
+    return xy
+
+def load_and_process_data(filepath):
+    return _load_and_process_data(filepath, os.path.getmtime(filepath))
+
+@functools.lru_cache(maxsize=256)
+def _load_sorted_d2(filepath, mtime):
+    d2 = sorted_squared_distances(_load_and_process_data(filepath, mtime))
+    d2.flags.writeable = False  # shared between callers through the cache
+    return d2
+
+# sorted squared distances from the screen center for a participant file
+def load_sorted_d2(filepath):
+    return _load_sorted_d2(filepath, os.path.getmtime(filepath))
+
 # define the app UI with organized layout and extra spacing
 app_ui = ui.page_fluid(
     ui.panel_title("Eye Center Visualization"),
@@ -44,77 +251,172 @@ def server(input: Inputs, output: Outputs, session):
     def load_participant_list():
         participant_files = [
             os.path.splitext(f)[0]
-            for f in os.listdir(default_directory)
-            if f.endswith('.txt')
+            for f in list_participant_files(default_directory)
         ]
         ui.update_select("participant_id", choices=participant_files)
+        build_cache(default_directory)
     
     load_participant_list()
 
-    # load and process data function
-    def load_and_process_data(filepath):
-        data = pd.read_csv(filepath, delimiter=',', header=None)
-        data.columns = ['trial', 'date', 'core_time', 'exp_time', 'pitch', 'yaw', 'roll',
-                        'right_x', 'right_y', 'left_x', 'left_y', 'right_conf', 'left_conf']
-        
-        # Calculate average eye position in normalized coordinates (0-1 range)
-        data['eye_x'] = data[['right_x', 'left_x']].mean(axis=1)
-        data['eye_y'] = data[['right_y', 'left_y']].mean(axis=1)
-        
-        # Scale to pixel coordinates
-        data['pixel_x'] = data['eye_x'] * DK2_RESOLUTION[0]
-        data['pixel_y'] = data['eye_y'] * DK2_RESOLUTION[1]
-        
-        return data
+    # One figure per plot for the whole session; each render clears and redraws
+    # its axes instead of allocating a new figure and canvas. Figure (rather than
+    # plt.subplots) keeps them out of pyplot's global figure registry
+    figures = {}
+    for name, figsize in [('fixation', (10, 6)), ('histogram', (6, 4)),
+                          ('all_fixations', (10, 10)), ('all_histogram', (6, 4))]:
+        fig = Figure(figsize=figsize, dpi=FIGURE_DPI)
+        figures[name] = (fig, fig.subplots())
 
-    # Reactive expression to load data
+    def reuse_figure(name, clear=True):
+        fig, ax = figures[name]
+        # shiny scales the dpi by the device pixel ratio while rendering, so reset it
+        fig.set_dpi(FIGURE_DPI)
+        if clear:
+            ax.clear()
+        return fig, ax
+
+    # The fixation plots keep their artists between renders instead: the axes are
+    # set up once here, and each render only updates the fixations and the radius
+    # and label of the center circle
+    center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
+
+    # uniform markers, so plot() stamps them in one pass instead of scatter's per-point path
+    fixation_points, = figures['fixation'][1].plot(
+        [], [], marker='o', linestyle='none', markersize=FIXATION_MARKER_SIZE,
+        markeredgecolor='purple', markeredgewidth=FIXATION_MARKER_EDGE, markerfacecolor='purple',
+        alpha=0.5, label='Fixations', rasterized=True,
+        zorder=1  # same zorder as the center circle, which is added later and so draws on top
+    )
+    # draw the binned fixation density as one image, so the draw cost doesn't grow with the number of fixations
+    density_image = figures['all_fixations'][1].imshow(
+        np.ma.masked_all((1, 1)), origin='upper', cmap='Purples', vmin=0, vmax=1, interpolation='nearest',
+        extent=[0, DK2_RESOLUTION[0], DK2_RESOLUTION[1], 0]
+    )
+    # the image has no legend entry of its own, so the legend gets a stand-in for it
+    density_legend_handle = Patch(color='purple', alpha=0.5, label='Fixations')
+
+    circles = {}
+    for name, title in [('fixation', "Eye Position Fixations on DK2 Headset Screen"),
+                        ('all_fixations', "Aggregate Eye Position Fixations Across All Participants")]:
+        fig, ax = figures[name]
+        ax.set_xlabel("Horizontal Position (pixels)")
+        ax.set_ylabel("Vertical Position (pixels)")
+        ax.invert_yaxis()
+        ax.set_aspect('equal')
+
+        # Add a central circle for DK2 headset center
+        circles[name] = ax.add_patch(Circle((center_x, center_y), 1, color='red', alpha=0.3))
+        ax.set_xlim(0, DK2_RESOLUTION[0])
+        ax.set_ylim(0, DK2_RESOLUTION[1])
+        # the limits are fixed to the screen, so updating the artists never needs to autoscale
+        ax.set_autoscale_on(False)
+        ax.use_sticky_edges = False
+        ax.set_title(title)
+
+    # Reactive expression for the path of the file to show
     @reactive.Calc
-    def data():
+    def selected_filepath():
         if input.file_upload() is not None:
             # If a file is uploaded, save it temporarily
             temp_file = tempfile.NamedTemporaryFile(delete=False)
             temp_file.write(input.file_upload()['data'])
             temp_file.close()
-            filepath = temp_file.name
-        else:
-            # Otherwise, use the selected participant file
-            filepath = os.path.join(default_directory, f"{input.participant_id()}.txt")
+            return temp_file.name
         
-        return load_and_process_data(filepath)
+        # Otherwise, use the selected participant file
+        return os.path.join(default_directory, f"{input.participant_id()}.txt")
+
+    # Reactive expression to load data
+    @reactive.Calc
+    def data():
+        return load_and_process_data(selected_filepath())
+
+    # Reactive expression for the center radius in pixels, shared by all four plots.
+    # shiny already debounces slider input on the client (250 ms), so dragging the
+    # slider doesn't send a value for every step
+    @reactive.Calc
+    def center_radius_pixels():
+        return DK2_RESOLUTION[0] * (input.center_radius_deg() / FOV_X)
+
+    # Reactive expression for the sorted squared distances of the loaded data.
+    # participant files use the per-file cache, so switching back to a
+    # participant doesn't sort again; an upload is saved to a new temporary
+    # file every time, so it wouldn't benefit and is sorted directly
+    @reactive.Calc
+    def data_d2():
+        if input.file_upload() is None:
+            return load_sorted_d2(selected_filepath())
+        return sorted_squared_distances(data())
+
+    # Reactive expression to load all participants' data, from the manifest when
+    # possible. independent of the slider so the aggregate plots only re-read
+    # files when they change
+    @reactive.Calc
+    def aggregate_data():
+        participant_files = list_participant_files(default_directory)
+        all_xy = load_manifest(default_directory, participant_files)
+        if all_xy is not None:
+            return all_xy
+
+        # load files in parallel (read_csv releases the GIL while parsing) and
+        # concatenate once instead of growing in the loop
+        filepaths = [os.path.join(default_directory, f) for f in participant_files]
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            arrays = list(executor.map(load_and_process_data, filepaths))
+
+        if not arrays:
+            return np.empty((0, 2), dtype=np.float32)
+        return np.concatenate(arrays)
+
+    # Reactive expression for the sorted squared distances of all participants, as
+    # a list of arrays: the aggregate inside count is the sum of the per-array
+    # counts, so without a manifest the per-participant arrays are never merged
+    @reactive.Calc
+    def aggregate_d2():
+        participant_files = list_participant_files(default_directory)
+        all_d2 = load_manifest_d2(default_directory, participant_files)
+        if all_d2 is not None:
+            # the manifest already has every participant's distances in one sorted array
+            return [all_d2]
+
+        return [load_sorted_d2(os.path.join(default_directory, f)) for f in participant_files]
+
+    # Reactive expression to bin all participants' fixations into a (log-scaled)
+    # density image for the aggregate plot. rows are y, columns are x
+    @reactive.Calc
+    def aggregate_density():
+        all_xy = aggregate_data()
+        counts, _, _ = np.histogram2d(
+            all_xy[:, 1], all_xy[:, 0],
+            bins=[DK2_RESOLUTION[1] // DENSITY_BIN_PX, DK2_RESOLUTION[0] // DENSITY_BIN_PX],
+            range=[[0, DK2_RESOLUTION[1]], [0, DK2_RESOLUTION[0]]]
+        )
+        # leave empty bins transparent rather than the lightest colormap shade
+        return np.ma.masked_equal(np.log1p(counts), 0)
 
     # plot fixation positions. shiny use
     @output
     @render.plot
     def fixation_plot():
-        data_df = data()
+        xy = data()
         
         # Calculate center radius in pixels
-        center_radius_pixels_x = DK2_RESOLUTION[0] * (input.center_radius_deg() / FOV_X)
+        center_radius_pixels_x = center_radius_pixels()
         center_radius_pixels_y = DK2_RESOLUTION[1] * (input.center_radius_deg() / FOV_Y)
         
         # Plot fixation positions in DK2 pixel space
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.scatter(data_df['pixel_x'], data_df['pixel_y'], s=5, color='purple', alpha=0.5, label='Fixations')
-        ax.set_xlabel("Horizontal Position (pixels)")
-        ax.set_ylabel("Vertical Position (pixels)")
-        ax.invert_yaxis()
-        ax.set_aspect('equal')
-
-        # Add a central circle for DK2 headset center
-        center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
-        center_circle = Circle((center_x, center_y), center_radius_pixels_x, color='red', alpha=0.3, label=f"Center ({input.center_radius_deg()}° radius)")
-        ax.add_patch(center_circle)
-        ax.set_xlim(0, DK2_RESOLUTION[0])
-        ax.set_ylim(0, DK2_RESOLUTION[1])
+        fig, ax = reuse_figure('fixation', clear=False)
+        fixation_points.set_data(xy[:, 0], xy[:, 1])
+        circles['fixation'].set_radius(center_radius_pixels_x)
+        circles['fixation'].set_label(f"Center ({input.center_radius_deg()}° radius)")
         
         # Count fixations inside and outside the circle
-        distances = np.sqrt((data_df['pixel_x'] - center_x) ** 2 + (data_df['pixel_y'] - center_y) ** 2)
-        inside_count = np.sum(distances <= center_radius_pixels_x)
-        outside_count = len(distances) - inside_count
+        d2 = data_d2()
+        inside_count = count_inside(d2, center_radius_pixels_x * center_radius_pixels_x)
+        outside_count = len(d2) - inside_count
         
         # Display counts in legend
         ax.legend(loc='upper right', title=f"Inside: {inside_count}, Outside: {outside_count}")
-        ax.set_title(f"Eye Position Fixations on DK2 Headset Screen")
 
         return fig
 
@@ -122,18 +424,16 @@ def server(input: Inputs, output: Outputs, session):
     @output
     @render.plot
     def histogram_plot():
-        data_df = data()
-        center_radius_pixels_x = DK2_RESOLUTION[0] * (input.center_radius_deg() / FOV_X)
-        center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
+        d2 = data_d2()
+        center_radius_pixels_x = center_radius_pixels()
 
         # Calculate proportion of fixations inside center circle
-        distances = np.sqrt((data_df['pixel_x'] - center_x) ** 2 + (data_df['pixel_y'] - center_y) ** 2)
-        inside_circle = distances <= center_radius_pixels_x
-        inside_ratio = np.sum(inside_circle) / len(distances) if len(distances) > 0 else 0
+        inside_count = count_inside(d2, center_radius_pixels_x * center_radius_pixels_x)
+        inside_ratio = inside_count / len(d2) if len(d2) > 0 else 0
         outside_ratio = 1 - inside_ratio
 
         # Plot histogram for proportions
-        fig, ax = plt.subplots(figsize=(6, 4))
+        fig, ax = reuse_figure('histogram')
         bars = ax.bar(["Inside Center", "Outside Center"], [inside_ratio, outside_ratio], color=['green', 'blue'])
         ax.set_ylabel("Proportion of Fixations")
         ax.set_title("Fixation Proportion Inside and Outside Center")
@@ -151,39 +451,26 @@ def server(input: Inputs, output: Outputs, session):
     @output
     @render.plot
     def all_fixations_plot():
-        all_data = pd.DataFrame()
-        participant_files = [f for f in os.listdir(default_directory) if f.endswith('.txt')]
+        all_d2 = aggregate_d2()
 
-        for file in participant_files:
-            filepath = os.path.join(default_directory, file)
-            participant_data = load_and_process_data(filepath)
-            all_data = pd.concat([all_data, participant_data], ignore_index=True)
-        
         # Calculate center radius in pixels based on input slider value
-        center_radius_pixels_x = DK2_RESOLUTION[0] * (input.center_radius_deg() / FOV_X)
+        center_radius_pixels_x = center_radius_pixels()
         
         # Plot fixation positions in DK2 pixel space
-        fig, ax = plt.subplots(figsize=(10, 10))
-        ax.scatter(all_data['pixel_x'], all_data['pixel_y'], s=5, color='purple', alpha=0.5, label='Fixations')
-        ax.set_xlabel("Horizontal Position (pixels)")
-        ax.set_ylabel("Vertical Position (pixels)")
-        ax.invert_yaxis()
-        ax.set_aspect('equal')
-
-        # Add a central circle for DK2 headset center
-        center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
-        ax.add_patch(Circle((center_x, center_y), center_radius_pixels_x, color='red', alpha=0.3, label=f"Center ({input.center_radius_deg()}° radius)"))
-        ax.set_xlim(0, DK2_RESOLUTION[0])
-        ax.set_ylim(0, DK2_RESOLUTION[1])
+        fig, ax = reuse_figure('all_fixations', clear=False)
+        density = aggregate_density()
+        density_image.set_data(density)
+        density_image.set_clim(0, density.filled(0).max() or 1)
+        circles['all_fixations'].set_radius(center_radius_pixels_x)
+        circles['all_fixations'].set_label(f"Center ({input.center_radius_deg()}° radius)")
         
         # Count fixations inside and outside the circle
-        distances = np.sqrt((all_data['pixel_x'] - center_x) ** 2 + (all_data['pixel_y'] - center_y) ** 2)
-        inside_count = np.sum(distances <= center_radius_pixels_x)
-        outside_count = len(distances) - inside_count
+        inside_count = sum(count_inside(d2, center_radius_pixels_x * center_radius_pixels_x) for d2 in all_d2)
+        outside_count = sum(len(d2) for d2 in all_d2) - inside_count
         
         # Display counts in legend
-        ax.legend(loc='upper right', title=f"Inside: {inside_count}, Outside: {outside_count}")
-        ax.set_title("Aggregate Eye Position Fixations Across All Participants")
+        ax.legend(handles=[density_legend_handle, circles['all_fixations']],
+                  loc='upper right', title=f"Inside: {inside_count}, Outside: {outside_count}")
 
         return fig
 
@@ -191,24 +478,17 @@ def server(input: Inputs, output: Outputs, session):
     @output
     @render.plot
     def all_histogram_plot():
-        all_data = pd.DataFrame()
-        participant_files = [f for f in os.listdir(default_directory) if f.endswith('.txt')]
+        all_d2 = aggregate_d2()
 
-        for file in participant_files:
-            filepath = os.path.join(default_directory, file)
-            participant_data = load_and_process_data(filepath)
-            all_data = pd.concat([all_data, participant_data], ignore_index=True)
-        
         # Calculate proportion of fixations inside center circle
-        center_radius_pixels_x = DK2_RESOLUTION[0] * (input.center_radius_deg() / FOV_X)
-        center_x, center_y = DK2_RESOLUTION[0] / 2, DK2_RESOLUTION[1] / 2
-        distances = np.sqrt((all_data['pixel_x'] - center_x) ** 2 + (all_data['pixel_y'] - center_y) ** 2)
-        inside_circle = distances <= center_radius_pixels_x
-        inside_ratio = np.sum(inside_circle) / len(distances) if len(distances) > 0 else 0
+        center_radius_pixels_x = center_radius_pixels()
+        inside_count = sum(count_inside(d2, center_radius_pixels_x * center_radius_pixels_x) for d2 in all_d2)
+        total_count = sum(len(d2) for d2 in all_d2)
+        inside_ratio = inside_count / total_count if total_count > 0 else 0
         outside_ratio = 1 - inside_ratio
 
         # Plot aggregate histogram for proportions with different colors
-        fig, ax = plt.subplots(figsize=(6, 4))
+        fig, ax = reuse_figure('all_histogram')
         bars = ax.bar(["Inside Center", "Outside Center"], [inside_ratio, outside_ratio], color=['orange', 'purple'])
         ax.set_ylabel("Proportion of Fixations")
         ax.set_title("Aggregate Fixation Proportion Inside and Outside Center")